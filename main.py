@@ -1,17 +1,26 @@
 from typing import List
 
 import logging
+import re
+import sys
 
-from pydantic import BaseModel
+try:
+    import orjson as _json
+except ImportError:  # orjson ships with Panoptic, stdlib json is only a fallback
+    import json as _json
+
+from pydantic import BaseModel, ValidationError
 
 from panoptic.core.plugin.plugin import APlugin
 from panoptic.core.plugin.plugin_project_interface import PluginProjectInterface
 from panoptic.models import ActionContext, Instance
 
 from .utils import (
+    MERGE_MAPPINGS_TA,
     MergeMapping,
     ensure_merge_source_present,
     get_instances_from_context,
+    is_mapping_entry,
     mark_cluster_validated,
     merge_metadata_for_instances,
 )
@@ -19,6 +28,16 @@ from .utils import (
 # logger for the plugin (Panoptic will normally configure logging handlers)
 logger = logging.getLogger("PanopticDatabasesMerger")
 
+# Number of merge_map_X_* slot pairs declared on PluginParams, and their
+# field names, built once instead of formatting them on every update.
+MERGE_MAP_SLOTS = 25
+SLOT_FIELDS = tuple(
+    (f"merge_map_{i}_sources", f"merge_map_{i}_destination") for i in range(1, MERGE_MAP_SLOTS + 1)
+)
+
+# Separator of the comma-separated `merge_map_X_sources` values, whitespace included.
+_SPLIT_SRC = re.compile(r"\s*,\s*")
+
 
 class PluginParams(BaseModel):
     """
@@ -34,6 +53,8 @@ class PluginParams(BaseModel):
     # Each `merge_map_X_sources` should be a comma-separated list of source
     # field names; `merge_map_X_destination` is the destination field name.
     # Empty slots are ignored. We provide 25 slots by default.
+    # They stay flat `str` fields on purpose: Panoptic's settings form only
+    # renders scalar params, so a single list field would not be editable.
     merge_map_1_sources: str = ""
     merge_map_1_destination: str = ""
     merge_map_2_sources: str = ""
@@ -94,51 +115,53 @@ class PanopticDatabasesMerger(APlugin):
     def __init__(self, project: PluginProjectInterface, plugin_path: str, name: str):
         super().__init__(name=name, project=project, plugin_path=plugin_path)
         self.params = PluginParams()
+        self._refresh_field_names()
         # runtime-only list of MergeMapping objects (not part of the BaseModel
         # to avoid core introspection issues). Plugins can set this via the
         # UI as a list of dicts that conform to MergeMapping at runtime.
         self.merge_mappings: list[MergeMapping] = []
+        # (input fingerprints, canonical mappings, canonical param fields) of the
+        # last update_params parse, so saves that leave the mapping fields
+        # untouched skip parsing and canonicalization entirely.
+        self._mapping_cache: tuple[tuple, list[MergeMapping], dict[str, str]] | None = None
+        # raw comma-separated slot value -> parsed source names
+        self._slot_cache: dict[str, tuple[str, ...]] = {}
         logger.info("Initializing PanopticDatabasesMerger plugin")
-        # try to initialise merge_mappings from raw param if present
+        # Build mappings from the raw JSON and the per-slot fields into one local
+        # list, and only publish it once it is complete.
         try:
-            import json
+            new_mappings: list[MergeMapping] = []
             logger.debug("Parsing merge_mappings_raw: %s", self.params.merge_mappings_raw)
-            parsed = json.loads(self.params.merge_mappings_raw or "[]")
-            self.merge_mappings = []
+            try:
+                parsed = _json.loads((self.params.merge_mappings_raw or "[]").encode())
+            except ValueError:
+                logger.exception("Invalid JSON in merge_mappings_raw; ignoring")
+                parsed = []
             if isinstance(parsed, list):
                 for item in parsed:
-                    if isinstance(item, dict):
-                        try:
-                            mm = MergeMapping(**item)
-                            self.merge_mappings.append(mm)
-                        except Exception:
-                            logger.exception("Invalid mapping entry in merge_mappings_raw, skipping: %s", item)
-            logger.info("Parsed %d merge mappings from JSON.", len(self.merge_mappings))
-        except Exception as e:
-            logger.exception("Failed to parse merge_mappings_raw: %s", e)
-            self.merge_mappings = []
-
-        # Also allow per-slot mappings from individual fields in the plugin UI.
-        try:
-            added = 0
-            for i in range(1, 26):
-                src_field = getattr(self.params, f"merge_map_{i}_sources", "")
-                dst_field = getattr(self.params, f"merge_map_{i}_destination", "")
+                    # merge_mappings_raw is only ever persisted by update_params,
+                    # which validates it, so skip Pydantic validation on load.
+                    if not is_mapping_entry(item):
+                        logger.warning("Invalid mapping entry in merge_mappings_raw, skipping: %s", item)
+                        continue
+                    new_mappings.append(MergeMapping.model_construct(sources=list(item["sources"]), destination=item["destination"]))
+            from_json = len(new_mappings)
+            logger.info("Parsed %d merge mappings from JSON.", from_json)
+
+            # Also allow per-slot mappings from individual fields in the plugin UI.
+            for src_key, dst_key in SLOT_FIELDS:
+                src_field = getattr(self.params, src_key)
+                dst_field = getattr(self.params, dst_key)
                 if src_field and dst_field:
-                    try:
-                        sources = [s.strip() for s in src_field.split(',') if s.strip()]
-                        if sources:
-                            mm = MergeMapping(sources=sources, destination=dst_field)
-                            self.merge_mappings.append(mm)
-                            added += 1
-                    except Exception:
-                        logger.exception("Invalid per-slot mapping at slot %d, skipping (sources=%s destination=%s)", i, src_field, dst_field)
-            if added:
-                logger.info("Added %d merge mappings from per-slot fields.", added)
-        except Exception as e:
-            logger.exception("Failed to parse per-slot merge mappings: %s", e)
-        
+                    sources = self._split_sources(src_field)
+                    if sources:
+                        new_mappings.append(MergeMapping.model_construct(sources=sources, destination=dst_field))
+            if len(new_mappings) > from_json:
+                logger.info("Added %d merge mappings from per-slot fields.", len(new_mappings) - from_json)
 
+            self.merge_mappings = new_mappings
+        except Exception as e:
+            logger.exception("Failed to build merge mappings: %s", e)
 
         # Ensure every imported instance has a merge-source tag (or the default placeholder).
         self.project.on_instance_import(self._on_instance_import)
@@ -153,13 +176,38 @@ class PanopticDatabasesMerger(APlugin):
         self.add_action_easy(self.execute_metadata_merge, ["execute", "selection", "images"])  # perform merge on selection
         logger.info("Registered actions: validate_cluster, execute_metadata_merge")
 
+    def _refresh_field_names(self):
+        """
+        Copies the metadata field names out of `self.params` into plain attributes
+        used by the per-instance hooks; must run whenever `self.params` is replaced.
+        """
+        self._src_field = sys.intern(self.params.merge_source_field)
+        self._validated_flag = sys.intern(self.params.merge_validated_flag)
+        self._missing_label = self.params.merge_source_missing_label
+
+    def _split_sources(self, src_field: str) -> list[str]:
+        """
+        Splits a comma-separated `merge_map_X_sources` value, memoized on the raw string.
+        """
+        sources = self._slot_cache.get(src_field)
+        if sources is None:
+            sources = tuple(s for s in _SPLIT_SRC.split(src_field.strip()) if s)
+            self._slot_cache[src_field] = sources
+        return list(sources)
+
+    async def _start(self):
+        # APlugin.start() reloads self.params from the project database.
+        self._refresh_field_names()
+
     async def _on_instance_import(self, instance: Instance):
-        logger.debug("on_instance_import: Ensuring merge source for instance %s", getattr(instance, 'id', None))
+        # Called once per imported instance: skip building log arguments unless DEBUG is on.
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("on_instance_import: Ensuring merge source for instance %s", instance.id)
         try:
             ensure_merge_source_present(
                 instance,
-                merge_source_field=self.params.merge_source_field,
-                missing_label=self.params.merge_source_missing_label,
+                merge_source_field=self._src_field,
+                missing_label=self._missing_label,
             )
         except Exception:
             logger.exception("Error while ensuring merge source for instance %s", getattr(instance, 'id', None))
@@ -179,12 +227,17 @@ class PanopticDatabasesMerger(APlugin):
             logger.warning("No instances found in context for validation.")
             return
 
+        logger.info("Marking %d instances as validated.", len(instances))
+        debug = logger.isEnabledFor(logging.DEBUG)
+        failed = 0
+        # mark_cluster_validated logs and swallows its own errors; just count them here.
         for inst in instances:
-            try:
-                logger.info("Marking instance %s as validated.", getattr(inst, 'id', None))
-                mark_cluster_validated(inst, flag_field=self.params.merge_validated_flag, flag_value=True)
-            except Exception:
-                logger.exception("Failed to mark instance %s as validated", getattr(inst, 'id', None))
+            if debug:
+                logger.debug("Marking instance %s as validated.", getattr(inst, 'id', None))
+            if not mark_cluster_validated(inst, flag_field=self._validated_flag, flag_value=True):
+                failed += 1
+        if failed:
+            logger.warning("validate_cluster: %d of %d instances could not be marked as validated.", failed, len(instances))
 
     async def execute_metadata_merge(self, context: ActionContext):
         """
@@ -202,25 +255,26 @@ class PanopticDatabasesMerger(APlugin):
             logger.warning("No instances found in context for merge.")
             return
 
+        if not self.merge_mappings:
+            logger.warning("No merge mappings configured; skipping merge for %d instances.", len(instances))
+            return
+
         logger.info("Merging metadata for %d instances with %d mappings.", len(instances), len(self.merge_mappings))
         try:
             # Validate mappings quickly before calling merge
             valid_mappings = []
             for mm in self.merge_mappings:
-                try:
-                    if not mm.sources or not mm.destination:
-                        logger.warning("Skipping mapping with empty sources or destination: %s", mm)
-                        continue
-                    valid_mappings.append(mm)
-                except Exception:
-                    logger.exception("Invalid mapping object encountered: %s", mm)
+                if not getattr(mm, 'sources', None) or not getattr(mm, 'destination', None):
+                    logger.warning("Skipping mapping with empty sources or destination: %s", mm)
+                    continue
+                valid_mappings.append(mm)
 
             merge_metadata_for_instances(
                 instances,
                 mappings=valid_mappings,
-                merge_source_field=self.params.merge_source_field,
-                merge_validated_flag=self.params.merge_validated_flag,
-                missing_label=self.params.merge_source_missing_label,
+                merge_source_field=self._src_field,
+                merge_validated_flag=self._validated_flag,
+                missing_label=self._missing_label,
             )
             logger.info("Metadata merge complete.")
         except Exception:
@@ -233,97 +287,110 @@ class PanopticDatabasesMerger(APlugin):
         """
         logger.info("update_params called with: %s", params)
 
-        # Build a merged params dict for persistence
-        current = {}
-
         incoming = {}
         if isinstance(params, dict):
             incoming = params
         else:
             try:
-                incoming = params.dict()
+                incoming = params.model_dump()
             except Exception:
                 incoming = {}
 
-        merged = dict(current)
-        merged.update(incoming)
-        logger.debug("Built merged params: current_keys=%d incoming_keys=%d total_keys=%d", len(current), len(incoming), len(merged))
+        # Build a merged params dict for persistence
+        merged = dict(incoming)
 
         # IMPORTANT: Per user's request, only use incoming values as the source-of-truth
         # for canonicalizing merge mappings. Do NOT consult `self.params`/current values
         # when deciding the canonical mapping list.
         try:
-            import json
-
-            mappings: list[MergeMapping] = []
-            source_chosen = 'none'
-
-            # 1) Prefer incoming JSON raw if present and parseable
             raw_incoming = (incoming.get('merge_mappings_raw') if isinstance(incoming, dict) else None) or ''
-            if raw_incoming:
-                try:
-                    parsed = json.loads(raw_incoming)
-                    if isinstance(parsed, list):
-                        for item in parsed:
-                            if isinstance(item, dict):
-                                try:
-                                    mappings.append(MergeMapping(**item))
-                                except Exception:
-                                    logger.exception("Skipping invalid mapping from incoming JSON: %s", item)
+            slots_incoming = tuple(
+                (
+                    (incoming.get(src_key) if isinstance(incoming, dict) else None) or '',
+                    (incoming.get(dst_key) if isinstance(incoming, dict) else None) or '',
+                )
+                for src_key, dst_key in SLOT_FIELDS
+            )
+            cache_key = (raw_incoming, slots_incoming)
+
+            # 0) Mapping inputs unchanged since the last save: reuse its result as is
+            if self._mapping_cache is not None and cache_key in self._mapping_cache[0]:
+                self.merge_mappings = list(self._mapping_cache[1])
+                merged.update(self._mapping_cache[2])
+                logger.debug("Mapping inputs unchanged; reusing %d canonical mappings", len(self.merge_mappings))
+            else:
+                mappings: list[MergeMapping] = []
+                source_chosen = 'none'
+
+                # 1) Prefer incoming JSON raw if present and parseable
+                if raw_incoming:
+                    try:
+                        # Fast path: decode and validate the whole list in pydantic-core.
+                        mappings.extend(MERGE_MAPPINGS_TA.validate_json(raw_incoming))
                         source_chosen = 'merge_mappings_raw'
-                    else:
-                        logger.warning("Incoming merge_mappings_raw did not parse to a list; ignoring")
-                except Exception:
-                    logger.exception("Invalid JSON in incoming merge_mappings_raw; ignoring")
-
-            # 2) If no valid incoming JSON, fall back to incoming per-slot fields
-            if source_chosen == 'none':
-                slot_added = 0
-                for i in range(1, 26):
-                    src_field = (incoming.get(f"merge_map_{i}_sources") if isinstance(incoming, dict) else None) or ''
-                    dst_field = (incoming.get(f"merge_map_{i}_destination") if isinstance(incoming, dict) else None) or ''
-                    if src_field and dst_field:
+                    except ValidationError:
+                        # Re-parse entry by entry so one invalid mapping does not drop the others.
                         try:
-                            sources = [s.strip() for s in src_field.split(',') if s.strip()]
-                            if sources:
-                                mappings.append(MergeMapping(sources=sources, destination=dst_field))
-                                slot_added += 1
+                            parsed = _json.loads(raw_incoming.encode() if isinstance(raw_incoming, str) else raw_incoming)
+                            if isinstance(parsed, list):
+                                for item in parsed:
+                                    if not is_mapping_entry(item):
+                                        logger.warning("Skipping invalid mapping from incoming JSON: %s", item)
+                                        continue
+                                    mappings.append(MergeMapping.model_construct(sources=list(item["sources"]), destination=item["destination"]))
+                                source_chosen = 'merge_mappings_raw'
+                            else:
+                                logger.warning("Incoming merge_mappings_raw did not parse to a list; ignoring")
                         except Exception:
-                            logger.exception("Invalid incoming per-slot mapping at slot %d, skipping (sources=%s destination=%s)", i, src_field, dst_field)
-                if slot_added:
-                    source_chosen = 'per-slot'
-
-            # 3) If neither provided, canonical list is empty (do not use existing self.params)
-            if source_chosen == 'none':
-                logger.info("No incoming mapping configuration provided; canonical mappings will be empty.")
-
-            # deduplicate while preserving order
-            seen = set()
-            canonical: list[MergeMapping] = []
-            for m in mappings:
-                key = (tuple(m.sources), m.destination)
-                if key not in seen:
-                    seen.add(key)
-                    canonical.append(m)
-
-            # Set runtime mappings
-            self.merge_mappings = canonical
-            logger.info("Canonicalized %d mappings from source: %s", len(self.merge_mappings), source_chosen)
-
-            # Overwrite mapping-related fields in merged to reflect canonical list
-            canonical_raw = json.dumps([
-                {"sources": mm.sources, "destination": mm.destination} for mm in self.merge_mappings
-            ])
-            merged['merge_mappings_raw'] = canonical_raw
-
-            for i in range(1, 26):
-                if i <= len(self.merge_mappings):
-                    mm = self.merge_mappings[i - 1]
-                    merged[f"merge_map_{i}_sources"] = ','.join(mm.sources)
-                    merged[f"merge_map_{i}_destination"] = mm.destination
-                else:
-                    merged[f"merge_map_{i}_sources"] = ''
-                    merged[f"merge_map_{i}_destination"] = ''
+                            logger.exception("Invalid JSON in incoming merge_mappings_raw; ignoring")
+
+                # 2) If no valid incoming JSON, fall back to incoming per-slot fields
+                if source_chosen == 'none':
+                    slot_added = 0
+                    for i, (src_field, dst_field) in enumerate(slots_incoming, start=1):
+                        if not (src_field and dst_field):
+                            continue
+                        if not (isinstance(src_field, str) and isinstance(dst_field, str)):
+                            logger.warning("Invalid incoming per-slot mapping at slot %d, skipping (sources=%s destination=%s)", i, src_field, dst_field)
+                            continue
+                        sources = self._split_sources(src_field)
+                        if sources:
+                            mappings.append(MergeMapping.model_construct(sources=sources, destination=dst_field))
+                            slot_added += 1
+                    if slot_added:
+                        source_chosen = 'per-slot'
+
+                # 3) If neither provided, canonical list is empty (do not use existing self.params)
+                if source_chosen == 'none':
+                    logger.info("No incoming mapping configuration provided; canonical mappings will be empty.")
+
+                # deduplicate while preserving order (first occurrence wins)
+                unique: dict[tuple, MergeMapping] = {}
+                for m in mappings:
+                    unique.setdefault((tuple(m.sources), m.destination), m)
+                canonical: list[MergeMapping] = list(unique.values())
+
+                # Set runtime mappings
+                self.merge_mappings = canonical
+                logger.info("Canonicalized %d mappings from source: %s", len(self.merge_mappings), source_chosen)
+
+                # Overwrite mapping-related fields in merged to reflect canonical list
+                slot_values = tuple(
+                    [(','.join(mm.sources), mm.destination) for mm in canonical[:MERGE_MAP_SLOTS]]
+                    + [('', '')] * (MERGE_MAP_SLOTS - len(canonical))
+                )
+                canonical_fields = {'merge_mappings_raw': MERGE_MAPPINGS_TA.dump_json(canonical).decode()}
+                canonical_fields.update(
+                    (key, value)
+                    for keys, values in zip(SLOT_FIELDS, slot_values)
+                    for key, value in zip(keys, values)
+                )
+                merged.update(canonical_fields)
+
+                # Canonicalization is idempotent, so the next save matches either the
+                # inputs just parsed or the canonical fields the UI now displays.
+                canonical_key = (canonical_fields['merge_mappings_raw'], slot_values)
+                self._mapping_cache = ((cache_key, canonical_key), list(canonical), canonical_fields)
 
         except Exception as e:
             logger.exception("Unexpected error in update_params canonicalization: %s", e)
@@ -331,6 +398,7 @@ class PanopticDatabasesMerger(APlugin):
         # Persist the canonical merged params once
         try:
             await super().update_params(merged)
+            self._refresh_field_names()
             logger.info("update_params persisted canonical params to core. total_mappings=%d", len(self.merge_mappings))
         except Exception:
             logger.exception("Failed to persist canonical params to core")
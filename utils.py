@@ -3,7 +3,7 @@ import logging
 import os
 from typing import Iterable, List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
 from panoptic.models import ActionContext, Instance
 from panoptic.utils import get_datadir
@@ -16,10 +16,33 @@ class MergeMapping(BaseModel):
     Describes how to merge multiple source metadata fields into a destination field.
     """
 
+    # Most instances come from `model_construct`; build the schema on first validation.
+    model_config = ConfigDict(defer_build=True)
+
     sources: List[str]
     destination: str
 
 
+# Shared validator/serializer for whole mapping lists (e.g. `merge_mappings_raw`),
+# built once, on first use, so its pydantic-core schema is reused across calls.
+MERGE_MAPPINGS_TA = TypeAdapter(List[MergeMapping], config=ConfigDict(defer_build=True))
+
+
+def is_mapping_entry(item) -> bool:
+    """
+    Cheap shape check for a decoded `merge_mappings_raw` entry, so it can be
+    turned into a `MergeMapping` with `model_construct` instead of validation.
+    """
+    if not isinstance(item, dict):
+        return False
+    sources = item.get("sources")
+    return (
+        isinstance(sources, list)
+        and all(isinstance(s, str) for s in sources)
+        and isinstance(item.get("destination"), str)
+    )
+
+
 def after_install():
     """
     Adds plugin to the list of registered Panoptic plugins.
@@ -32,22 +55,34 @@ def after_install():
         json.dump(projects, f)
 
 
+# Metadata attribute name resolved by `get_properties`, per instance class.
+_PROPS_ATTR_CACHE: dict[type, str] = {}
+_MISSING = object()
+
+
 def get_properties(instance: Instance) -> dict:
     """
     Tries common attributes used by Panoptic instances to store metadata and returns a dict.
     """
-    for attr in ("properties", "props", "metadata"):
-        if hasattr(instance, attr):
-            value = getattr(instance, attr)
-            if value is None:
-                value = {}
-                setattr(instance, attr, value)
-            return value
-
-    # Fallback if the instance does not expose a known metadata attribute.
-    logger.debug("Instance has no standard metadata attributes; creating 'properties' on instance %s", getattr(instance, 'id', None))
-    instance.properties = {}
-    return instance.properties
+    cls = type(instance)
+    attr = _PROPS_ATTR_CACHE.get(cls)
+    value = getattr(instance, attr, _MISSING) if attr is not None else _MISSING
+    if value is _MISSING:
+        for attr in ("properties", "props", "metadata"):
+            if hasattr(instance, attr):
+                value = getattr(instance, attr)
+                break
+        else:
+            # Fallback if the instance does not expose a known metadata attribute.
+            logger.debug("Instance has no standard metadata attributes; creating 'properties' on instance %s", getattr(instance, 'id', None))
+            attr = "properties"
+            value = None
+        _PROPS_ATTR_CACHE[cls] = attr
+
+    if value is None:
+        value = {}
+        setattr(instance, attr, value)
+    return value
 
 
 def ensure_merge_source_present(instance: Instance, merge_source_field: str, missing_label: str) -> str:
@@ -55,26 +90,35 @@ def ensure_merge_source_present(instance: Instance, merge_source_field: str, mis
     Ensures the merge-source field exists; if missing, sets the placeholder label.
     """
     try:
-        props = get_properties(instance)
-        if not props.get(merge_source_field):
-            logger.debug("Setting missing merge_source_field '%s' to placeholder for instance %s", merge_source_field, getattr(instance, 'id', None))
-            props[merge_source_field] = missing_label
-        return props[merge_source_field]
+        return _ensure_merge_source(get_properties(instance), merge_source_field, missing_label)
     except Exception:
         logger.exception("Error ensuring merge source present for instance %s", getattr(instance, 'id', None))
         return missing_label
 
 
-def mark_cluster_validated(instance: Instance, flag_field: str, flag_value: bool = True):
+def _ensure_merge_source(props: dict, merge_source_field: str, missing_label: str) -> str:
+    """
+    Same as `ensure_merge_source_present`, on an already resolved metadata dict.
+    """
+    if not props.get(merge_source_field):
+        props[merge_source_field] = missing_label
+    return props[merge_source_field]
+
+
+def mark_cluster_validated(instance: Instance, flag_field: str, flag_value: bool = True) -> bool:
     """
     Marks an instance as part of a validated cluster for merging.
+    Returns False (after logging) if the flag could not be set.
     """
     try:
         props = get_properties(instance)
         props[flag_field] = flag_value
-        logger.debug("Marked instance %s with validation flag %s=%s", getattr(instance, 'id', None), flag_field, flag_value)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Marked instance %s with validation flag %s=%s", getattr(instance, 'id', None), flag_field, flag_value)
+        return True
     except Exception:
         logger.exception("Failed to mark instance %s as validated", getattr(instance, 'id', None))
+        return False
 
 
 def merge_metadata_for_instances(
@@ -96,60 +140,62 @@ def merge_metadata_for_instances(
         mappings = list(mappings)
         logger.info("merge_metadata_for_instances called: instances=%d mappings=%d", len(instances), len(mappings))
 
-        # Require cluster validation before merging.
-        if not _is_validated(instances, merge_validated_flag):
-            logger.info("Cluster not validated (flag=%s); skipping merge", merge_validated_flag)
-            return
-
         if not mappings:
             logger.info("No mappings provided; skipping merge")
             return
 
-        # Ensure all instances have a merge-source value.
+        # Resolve each instance's metadata dict once instead of once per mapping.
+        props_list = []
         for inst in instances:
             try:
-                ensure_merge_source_present(inst, merge_source_field=merge_source_field, missing_label=missing_label)
+                props_list.append(get_properties(inst))
             except Exception:
-                logger.exception("Failed to ensure merge source for instance %s", getattr(inst, 'id', None))
+                logger.exception("Failed to read properties for instance %s", getattr(inst, 'id', None))
+
+        # Require cluster validation before merging.
+        if not _is_validated(props_list, merge_validated_flag):
+            logger.info("Cluster not validated (flag=%s); skipping merge", merge_validated_flag)
+            return
+
+        # Ensure all instances have a merge-source value; the returned label is
+        # looked up once here and reused by every mapping below.
+        labels = [_ensure_merge_source(props, merge_source_field, missing_label) for props in props_list]
 
+        debug = logger.isEnabledFor(logging.DEBUG)
+        updated = 0
         for idx, mapping in enumerate(mappings, start=1):
             try:
-                logger.debug("Processing mapping %d -> destination=%s sources=%s", idx, mapping.destination, mapping.sources)
-                merged_values = []
-                for inst in instances:
-                    try:
-                        props = get_properties(inst)
-                        source_label = props.get(merge_source_field, missing_label) or missing_label
-                        for source_field in mapping.sources:
-                            value = props.get(source_field)
-                            if value:
-                                merged_values.append(f"{value} [{source_label}]")
-                    except Exception:
-                        logger.exception("Error reading properties for instance %s while processing mapping %s", getattr(inst, 'id', None), mapping)
-
-                merged_value = ";".join(merged_values)
-                logger.debug("Mapping %d produced merged_value length=%d", idx, len(merged_value))
-                for inst in instances:
-                    try:
-                        props = get_properties(inst)
-                        props[mapping.destination] = merged_value
-                    except Exception:
-                        logger.exception("Failed to write merged value to instance %s for destination %s", getattr(inst, 'id', None), mapping.destination)
+                sources = mapping.sources
+                destination = mapping.destination
+                if debug:
+                    logger.debug("Processing mapping %d -> destination=%s sources=%s", idx, destination, sources)
+                merged_value = ";".join(
+                    f"{value} [{source_label}]"
+                    for props, source_label in zip(props_list, labels)
+                    for source_field in sources
+                    if (value := props.get(source_field))
+                )
+                if debug:
+                    logger.debug("Mapping %d produced merged_value length=%d", idx, len(merged_value))
+                # Only write changed values so re-running a merge does not touch
+                # instances whose destination is already up to date.
+                for props in props_list:
+                    if props.get(destination) != merged_value:
+                        props[destination] = merged_value
+                        updated += 1
             except Exception:
                 logger.exception("Unhandled error while applying mapping %s", mapping)
+        logger.info("Merge updated %d destination values across %d instances", updated, len(props_list))
     except Exception:
         logger.exception("Unhandled error in merge_metadata_for_instances")
 
 
-def _is_validated(instances: Iterable[Instance], flag_field: str) -> bool:
+def _is_validated(props_list: Iterable[dict], flag_field: str) -> bool:
     """
-    Checks if the cluster/selection has been validated by ensuring at least one instance carries the flag.
+    Checks if the cluster/selection has been validated by ensuring at least one instance's
+    metadata (as returned by `get_properties`) carries the flag.
     """
-    for inst in instances:
-        props = get_properties(inst)
-        if props.get(flag_field):
-            return True
-    return False
+    return any(props.get(flag_field) for props in props_list)
 
 
 def get_instances_from_context(context: ActionContext) -> List[Instance]: